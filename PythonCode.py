@@ -1,46 +1,55 @@
 # --- bootstrap: install missing deps (installs only if missing) ---
-import sys, subprocess, importlib.util
+import sys, subprocess, importlib.util, hashlib
+from pathlib import Path
 def ensure_packages(mod_to_pip):
-    missing = [pip for mod, pip in mod_to_pip
-               if importlib.util.find_spec(mod) is None]
+    # Warm runs: one sentinel per verified interpreter + list, so skip the find_spec scans
+    # (keyed by hash so scripts with different lists don't overwrite each other's).
+    stamp = " ".join([sys.executable, *(pip for _, pip in mod_to_pip)])
+    sentinel = Path.home() / f".cultivate_deps_ok.{hashlib.md5(stamp.encode()).hexdigest()[:8]}"
+    if sentinel.is_file():
+        return
+    missing = [pip for mod, pip in mod_to_pip if importlib.util.find_spec(mod) is None]
     if missing:
         subprocess.check_call([sys.executable, "-m", "pip", "install", *missing])
+    sentinel.touch()
 ensure_packages([
     ("geopandas", "geopandas"),
     ("folium",    "folium"),
     ("shapely",   "shapely"),
     ("pyproj",    "pyproj"),
-    ("fiona",     "fiona"),
+    ("pyogrio",   "pyogrio"),
+    ("pyarrow",   "pyarrow"),
 ])
 
 # --- R → Python equivalent map ---
-import json
-import geopandas as gpd
 import folium
-from pathlib import Path
+from geo_helpers import fips_where, read_cached, reproject, slim_coverage, gj
 
-# 1) Read shapefile
+# 1) Read shapefile, filtered to the same counties as your R work (Elkhart, St. Joseph, Marshall)
+#    The OGR driver applies the WHERE and column pruning, so the other ~1500 Indiana tracts never reach Python.
 shp_path = Path("tl_2021_18_tract.shp")   # adjust path if needed
-gdf = gpd.read_file(shp_path)
+keep_fips = ("039", "141", "099")
+gdf = read_cached(
+    shp_path,
+    where=fips_where(keep_fips),
+    columns=["NAME", "COUNTYFP"],
+)
 
 # 2) CRS: assign NAD83 only if missing, then transform to WGS84
 if gdf.crs is None:
     gdf = gdf.set_crs(epsg=4269)          # only if you KNOW source is NAD83
-gdf = gdf.to_crs(epsg=4326)               # leaflet expects 4326
-
-# 3) Filter to the same counties as your R work (Elkhart, St. Joseph, Marshall)
-keep_fips = {"039", "141", "099"}
-gdf = gdf[gdf["COUNTYFP"].astype(str).isin(keep_fips)].copy()
+gdf = reproject(gdf, 4326)                # leaflet expects 4326
+gdf = slim_coverage(gdf)                  # smaller GeoJSON in the HTML, shared edges kept
 
 # (Optional) If you patched NAME like "113.10" → "113.1" in R:
 #gdf["NAME"] = gdf["NAME"].astype(str).str.replace(r"^113\.10$", "113.1", regex=True)
 
-# 4) Build the map with same style and tooltip label ~NAME
+# 3) Build the map with same style and tooltip label ~NAME
 m = folium.Map(tiles="OpenStreetMap")     # no zoom_start; we'll fit to layer bounds
 
 style = {"color": "black", "weight": 1, "fillOpacity": 0.25}
-gj = folium.GeoJson(
-    data=json.loads(gdf.to_json()),       # avoids Shapely 2.x array-interface issue
+tracts_layer = folium.GeoJson(
+    data=gj(gdf),
     name="Tracts",
     style_function=lambda _: style,
     tooltip=folium.GeoJsonTooltip(fields=["NAME"], aliases=["Tract:"])
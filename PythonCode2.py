@@ -1,23 +1,35 @@
 # --- bootstrap: install missing deps (installs only if missing) ---
-import sys, subprocess, importlib.util
+import sys, subprocess, importlib.util, hashlib
+from pathlib import Path
 def ensure_packages(mod_to_pip):
+    # Warm runs: one sentinel per verified interpreter + list, so skip the find_spec scans
+    # (keyed by hash so scripts with different lists don't overwrite each other's).
+    stamp = " ".join([sys.executable, *(pip for _, pip in mod_to_pip)])
+    sentinel = Path.home() / f".cultivate_deps_ok.{hashlib.md5(stamp.encode()).hexdigest()[:8]}"
+    if sentinel.is_file():
+        return
     missing = [pip for mod, pip in mod_to_pip if importlib.util.find_spec(mod) is None]
     if missing:
         subprocess.check_call([sys.executable, "-m", "pip", "install", *missing])
+    sentinel.touch()
 ensure_packages([
     ("geopandas","geopandas"), ("folium","folium"),
     ("shapely","shapely"), ("pyproj","pyproj"),
-    ("fiona","fiona"), ("branca","branca"),
+    ("pyogrio","pyogrio"), ("pyarrow","pyarrow"),
+    ("branca","branca"),
     ("pandas","pandas"),
 ])
 
 # --- imports ---
-import json, warnings
-from pathlib import Path
+import re, warnings
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 import folium
 import branca.colormap as cm
+import shapely
+from pyogrio import read_dataframe
+from geo_helpers import fips_where, read_cached, reproject, slim, slim_coverage, gj, cmap_hex
 
 # ----------------------------
 # 1) Load tracts (merged_df equivalent) and prep CRS
@@ -25,10 +37,18 @@ import branca.colormap as cm
 tracts_path = Path("merged_df.geojson")  # preferred (has PovertyNum, MedianIncomeNum, CensusReporter_Link)
 fallback_shp = Path("tl_2021_18_tract.shp")
 
+# Filter to Elkhart(039), St. Joseph(141), Marshall(099): in the OGR driver for the TIGER shapefile,
+# on the pandas side (if COUNTYFP present) for merged_df.geojson
+keep_fips = ["039", "141", "099"]
 if tracts_path.exists():
-    gdf = gpd.read_file(tracts_path)
+    gdf = read_dataframe(tracts_path, use_arrow=True)
+    if "COUNTYFP" in gdf.columns:
+        gdf = gdf[gdf["COUNTYFP"].isin(keep_fips)].copy()  # copy: later column assignments
 else:
-    gdf = gpd.read_file(fallback_shp)
+    gdf = read_cached(
+        fallback_shp,
+        where=fips_where(keep_fips),
+    )
 
 # CRS: set if unknown (only if you KNOW source), then transform to WGS84
 if gdf.crs is None:
@@ -36,20 +56,19 @@ if gdf.crs is None:
     # gdf = gdf.set_crs(4269)
     # otherwise assume already lon/lat; set to 4326 so folium works
     gdf = gdf.set_crs(4326)
-gdf = gdf.to_crs(4326)
-
-# Filter to Elkhart(039), St. Joseph(141), Marshall(099) if COUNTYFP present
-keep_fips = {"039", "141", "099"}
-if "COUNTYFP" in gdf.columns:
-    gdf = gdf[gdf["COUNTYFP"].astype(str).isin(keep_fips)].copy()
+gdf = reproject(gdf, 4326)
+tract_coverage = gdf.geometry  # full resolution for the county union and route filter
+gdf = slim_coverage(gdf)  # smaller GeoJSON in the HTML, shared edges kept
 
 # Ensure NAME exists (for label)
 if "NAME" not in gdf.columns:
     gdf["NAME"] = gdf.index.astype(str)
 
 # Poverty & income fields (mirror R)
+_CLEAN = re.compile(r"[^0-9.\-]")
+
 def percent_to_float(s):
-    return pd.to_numeric(pd.Series(s).astype(str).str.replace(r"[^0-9.\-]", "", regex=True), errors="coerce")
+    return pd.to_numeric(pd.Series(s).astype(str).str.replace(_CLEAN, "", regex=True), errors="coerce")
 
 has_poverty = False
 if "PovertyNum" in gdf.columns:
@@ -60,14 +79,14 @@ else:
     gdf["PovertyNum"] = pd.NA  # keep column to avoid KeyError
 
 if "MedianIncomeNum" not in gdf.columns and "Median.Income." in gdf.columns:
-    gdf["MedianIncomeNum"] = pd.to_numeric(
-        gdf["Median.Income."].astype(str).str.replace(r"[^0-9.\-]", "", regex=True), errors="coerce"
-    )
+    gdf["MedianIncomeNum"] = percent_to_float(gdf["Median.Income."])
 
-gdf["PovertyLabel"] = gdf["PovertyNum"].map(lambda x: f"{float(x):.1f}%" if pd.notna(x) else "N/A")
-gdf["MedianIncomeLabel"] = gdf.get("MedianIncomeNum", pd.Series([None]*len(gdf))).map(
-    lambda x: f"${x:,.0f}" if pd.notna(x) else "N/A"
-)
+# Labels: format only the non-missing values (str.format rounds like the R/f-string output)
+pov = pd.to_numeric(gdf["PovertyNum"], errors="coerce")
+gdf["PovertyLabel"] = pov.dropna().map("{:.1f}%".format).reindex(gdf.index, fill_value="N/A")
+inc = pd.to_numeric(gdf["MedianIncomeNum"], errors="coerce") if "MedianIncomeNum" in gdf.columns \
+    else pd.Series(index=gdf.index, dtype=float)
+gdf["MedianIncomeLabel"] = inc.dropna().map("${:,.0f}".format).reindex(gdf.index, fill_value="N/A")
 
 # ----------------------------
 # 2) Base map (CartoDB.Positron) + fit bounds
@@ -86,18 +105,16 @@ if has_poverty and gdf["PovertyNum"].notna().any():
     cmap = cm.linear.PuRd_09.scale(vmin, vmax)  # similar to R pal_poverty
     cmap.caption = "Poverty Level (%)"
 
+# Fill color encodes poverty (like R): one vectorized colormap pass, stored as a feature property
+gdf["__fill__"] = cmap_hex(cmap, gdf["PovertyNum"], "#cccccc") if cmap is not None else "#cccccc"
+
 def poverty_style(feat):
-    # Fill color encodes poverty (like R); white borders, thin weight
-    if cmap is not None:
-        val = feat["properties"].get("PovertyNum", None)
-        fill = "#cccccc" if val is None else cmap(val)
-    else:
-        fill = "#cccccc"
-    return {"fillColor": fill, "fillOpacity": 0.55, "color": "white", "weight": 0.3}
+    # white borders, thin weight
+    return {"fillColor": feat["properties"]["__fill__"], "fillOpacity": 0.55, "color": "white", "weight": 0.3}
 
 poverty_fg = folium.FeatureGroup(name="Poverty Level", show=False)
 folium.GeoJson(
-    data=json.loads(gdf.to_json()),
+    data=gj(gdf),
     name="Poverty Level",
     style_function=poverty_style,
     highlight_function=lambda f: {"weight": 2, "color": "#666", "fillOpacity": 0.9},
@@ -109,21 +126,23 @@ folium.GeoJson(
 ).add_to(poverty_fg)
 
 # Polygon popups: build rich HTML like your R popup
-for _, row in gdf.iterrows():
-    try:
-        c = row.geometry.centroid  # attach popup at centroid (folium limitation for clickable link)
-        html = (
-            f"<strong>Tract {row.get('NAME','')}</strong><br>"
-            f"Poverty Level: {row.get('PovertyLabel','N/A')}<br>"
-            f"Median Income: {row.get('MedianIncomeLabel','N/A')}<br>"
-        )
-        link = row.get("CensusReporter_Link") or row.get("CensusReporter_Link ")
-        if isinstance(link, str) and link.strip():
-            html += f"<a href='{link}' target='_blank'>View Full Tract Info</a>"
-        folium.Marker([c.y, c.x], popup=folium.Popup(html, max_width=420),
-                      icon=folium.DivIcon(html="")).add_to(poverty_fg)
-    except Exception:
-        pass
+# attach popup at centroid (folium limitation for clickable link); one vectorized GEOS call for all centroids
+cent = shapely.centroid(gdf.geometry.values)
+xs, ys = shapely.get_x(cent), shapely.get_y(cent)
+link_col = next((c for c in ["CensusReporter_Link", "CensusReporter_Link "] if c in gdf.columns), None)
+links = gdf[link_col].to_numpy() if link_col else [None] * len(gdf)
+for x, y, name, pov, inc, link in zip(xs, ys, gdf["NAME"].to_numpy(), gdf["PovertyLabel"].to_numpy(),
+                                      gdf["MedianIncomeLabel"].to_numpy(), links):
+    if pd.isna(x) or pd.isna(y): continue  # empty geometry
+    html = (
+        f"<strong>Tract {name}</strong><br>"
+        f"Poverty Level: {pov}<br>"
+        f"Median Income: {inc}<br>"
+    )
+    if isinstance(link, str) and link.strip():
+        html += f"<a href='{link}' target='_blank'>View Full Tract Info</a>"
+    folium.Marker([y, x], popup=folium.Popup(html, max_width=420),
+                  icon=folium.DivIcon(html="")).add_to(poverty_fg)
 
 poverty_fg.add_to(m)
 if cmap is not None:
@@ -135,21 +154,30 @@ if cmap is not None:
 # If you have target_counties, load it; else dissolve tracts by COUNTYFP to get boundaries
 target_counties_path = Path("target_counties.geojson")
 if target_counties_path.exists():
-    target_counties = gpd.read_file(target_counties_path)
+    target_counties = read_dataframe(target_counties_path, use_arrow=True)
     if target_counties.crs is None: target_counties = target_counties.set_crs(4326)
-    target_counties = target_counties.to_crs(4326)
+    target_counties = reproject(target_counties, 4326)
 else:
     if "COUNTYFP" in gdf.columns:
         name_map = {"039": "Elkhart", "141": "St. Joseph", "099": "Marshall"}
-        tmp = gdf[["COUNTYFP","geometry"]].copy()
+        tmp = gpd.GeoDataFrame({"COUNTYFP": gdf["COUNTYFP"]}, geometry=tract_coverage, crs=gdf.crs)
         tmp["name"] = tmp["COUNTYFP"].map(name_map).fillna(tmp["COUNTYFP"])
-        target_counties = tmp.dissolve(by="name", as_index=False)
+        # tracts tile each county exactly → linear-time coverage union instead of a full overlay dissolve;
+        # coverage_union_all silently returns invalid output on a non-coverage (external merged_df.geojson
+        # may not be exactly noded), so check first and use a general union there
+        def county_union(g):
+            if shapely.coverage_is_valid(g.values):
+                return shapely.coverage_union_all(g.values)
+            return shapely.union_all(g.values)
+        target_counties = tmp.groupby("name")["geometry"].apply(county_union).reset_index()
+        target_counties = gpd.GeoDataFrame(target_counties, geometry="geometry", crs=gdf.crs)
     else:
         target_counties = gpd.GeoDataFrame(geometry=[])
+target_counties = slim_coverage(target_counties) if len(target_counties) else target_counties
 
 if len(target_counties):
     folium.GeoJson(
-        data=json.loads(target_counties.to_json()),
+        data=gj(target_counties),
         name="County Boundaries",
         style_function=lambda f: {"color": "black", "weight": 3, "opacity": 0.8, "fillOpacity": 0},
         tooltip=folium.GeoJsonTooltip(fields=["name"], aliases=["County"]) if "name" in target_counties.columns else None,
@@ -161,18 +189,20 @@ if len(target_counties):
 # ----------------------------
 routes_path = Path("TranspoRoutes.shp")
 if routes_path.exists():
-    routes = gpd.read_file(routes_path)
+    routes = read_cached(routes_path)
     if routes.crs is None:
         routes = routes.set_crs(4326)  # set proper source CRS if known, then to_crs(4326)
     else:
-        routes = routes.to_crs(4326)
+        routes = reproject(routes, 4326)
 
-    # keep only routes intersecting selected tracts (optional)
+    # keep only routes intersecting selected tracts (optional); STRtree over the full-resolution
+    # tracts instead of unary_union, and before slim() so simplification never flips a border route
     try:
-        region = gdf.unary_union
-        routes = routes[routes.intersects(region)]
+        route_idx, _ = gpd.GeoSeries(tract_coverage).sindex.query(routes.geometry, predicate="intersects")
+        routes = routes.iloc[np.unique(route_idx)].copy()
     except Exception:
         pass
+    routes = slim(routes)
 
     # choose route name column
     label_col = next((c for c in ["clean_name","line_name","route_long_name","route_short_name"] if c in routes.columns), None)
@@ -198,13 +228,16 @@ if routes_path.exists():
     }
     # note: keys must match your routes[label_col] exactly (they look truncated in your R code)
 
-    routes["__color__"] = routes[label_col].map(route_colors_hex).fillna("#808080")
+    # small integer palette index per feature instead of a repeated hex string; code -1 (missing name) hits the trailing grey
+    route_names = pd.Categorical(routes[label_col])
+    routes["__ci__"] = route_names.codes
+    route_palette = [route_colors_hex.get(n, "#808080") for n in route_names.categories] + ["#808080"]
 
     routes_fg = folium.FeatureGroup(name="Bus Routes", show=False)
     folium.GeoJson(
-        data=json.loads(routes.to_json()),
+        data=gj(routes),
         name="Bus Routes",
-        style_function=lambda f: {"color": f["properties"].get("__color__","#808080"), "weight": 3, "opacity": 0.9},
+        style_function=lambda f, p=route_palette: {"color": p[f["properties"]["__ci__"]], "weight": 3, "opacity": 0.9},
         tooltip=folium.GeoJsonTooltip(fields=[label_col], aliases=["Route"]),
         popup=folium.GeoJsonPopup(fields=[label_col], aliases=["Route"])
     ).add_to(routes_fg)
@@ -217,14 +250,14 @@ else:
 # ----------------------------
 pantries_poly_path = Path("pantries_sf.geojson")
 if pantries_poly_path.exists():
-    pantries_sf = gpd.read_file(pantries_poly_path)
+    pantries_sf = read_dataframe(pantries_poly_path, use_arrow=True)
     if pantries_sf.crs is None: pantries_sf = pantries_sf.set_crs(4326)
-    pantries_sf = pantries_sf.to_crs(4326)
+    pantries_sf = slim(reproject(pantries_sf, 4326))
 
     cover_fg = folium.FeatureGroup(name="Pantry Coverage", show=False)
     def cover_style(_):
         return {"fillColor": "#9370DB", "fillOpacity": 0.18, "color": "#6A5ACD", "opacity": 0.1, "weight": 1}
-    folium.GeoJson(data=json.loads(pantries_sf.to_json()), style_function=cover_style).add_to(cover_fg)
+    folium.GeoJson(data=gj(pantries_sf), style_function=cover_style).add_to(cover_fg)
     cover_fg.add_to(m)
 
 # ----------------------------
@@ -232,25 +265,31 @@ if pantries_poly_path.exists():
 # ----------------------------
 pantries_csv = Path("pantries.csv")
 if pantries_csv.exists():
-    from folium.plugins import MarkerCluster
+    from folium.plugins import FastMarkerCluster
     pantries = pd.read_csv(pantries_csv)
     pantries_fg = folium.FeatureGroup(name="Food Pantries", show=False)
-    cluster = MarkerCluster().add_to(pantries_fg)
 
-    def val(r, k): v = r.get(k); return "" if pd.isna(v) else str(v)
-    for _, r in pantries.iterrows():
-        lat, lon = r.get("lat"), r.get("long")
-        if pd.isna(lat) or pd.isna(lon): continue
+    # one JSON array + a JS callback instead of a folium Marker/Popup object per pantry
+    if {"lat", "long"} <= set(pantries.columns):
+        pantries = pantries.dropna(subset=["lat", "long"])
+        def val(k): return pantries[k].fillna("").astype(str) if k in pantries.columns else pd.Series("", index=pantries.index)
+        link = val("Link")
         html = (
-            f"<strong>{val(r,'Pantry.Name')}</strong><br>"
-            f"Address: {val(r,'Address')}<br>"
-            f"Hours: {val(r,'Recurring.Hours')}<br>"
-            f"Requirements: {val(r,'What.to.Bring')}<br>"
+            "<strong>" + val("Pantry.Name") + "</strong><br>"
+            + "Address: " + val("Address") + "<br>"
+            + "Hours: " + val("Recurring.Hours") + "<br>"
+            + "Requirements: " + val("What.to.Bring") + "<br>"
+            + ("<a href='" + link + "' target='_blank'>View on Google Maps</a>").where(link.str.strip() != "", "")
         )
-        link = r.get("Link")
-        if isinstance(link, str) and link.strip():
-            html += f"<a href='{link}' target='_blank'>View on Google Maps</a>"
-        folium.Marker([lat, lon], popup=folium.Popup(html, max_width=420)).add_to(cluster)
+        rows = [[la, lo, h] for la, lo, h in zip(pantries["lat"].tolist(), pantries["long"].tolist(), html.tolist())]
+        callback = """
+        function (row) {
+            var marker = L.marker(new L.LatLng(row[0], row[1]));
+            marker.bindPopup(row[2], {maxWidth: 420});
+            return marker;
+        }
+        """
+        FastMarkerCluster(rows, callback=callback).add_to(pantries_fg)
     pantries_fg.add_to(m)
 
 # ----------------------------
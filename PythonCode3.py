@@ -8,45 +8,55 @@ Outputs:
 
 import re
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 warnings.filterwarnings("ignore", category=UserWarning)
 
 import pandas as pd
 import geopandas as gpd
 import numpy as np
+import shapely
 from shapely.geometry import Point
 from geopy.geocoders import ArcGIS
 from geopy.extra.rate_limiter import RateLimiter
 import folium
 from folium import FeatureGroup, LayerControl
-from folium.plugins import MarkerCluster
+from folium.plugins import FastMarkerCluster
 import branca
 
+from geo_helpers import fips_where, read_cached, transformer, reproject, slim, slim_coverage, gj, cmap_hex
+
 # -------------------------------
 # Helpers
 # -------------------------------
 
-def parse_number(x):
-    """Float from strings like '$56,123' or '12.3%'; None on failure."""
-    if pd.isna(x):
-        return None
-    s = re.sub(r"[^\d\.\-]", "", str(x))
-    try:
-        return float(s)
-    except ValueError:
-        return None
-
-def norm_tract_name(x):
+_CLEAN = re.compile(r"[^\d\.\-]")
+
+def parse_numeric(s):
+    """Floats from strings like '$56,123' or '12.3%' (whole column at once); NaN on failure."""
+    return pd.to_numeric(s.astype(str).str.replace(_CLEAN, "", regex=True), errors="coerce")
+
+def fmt_label(s, fmt, na="NA"):
+    """Format only the non-missing values (e.g. thousands separators), na elsewhere."""
+    s = pd.to_numeric(s, errors="coerce")
+    return s.dropna().map(fmt.format).reindex(s.index, fill_value=na)
+
+def text_col(df, name, default):
+    """Column as str with missing values (or a missing column) replaced by default."""
+    if name not in df.columns:
+        return pd.Series(default, index=df.index)
+    return df[name].fillna(default).astype(str)
+
+_DECIMAL_NAME = re.compile(r"\d+\.\d+")
+
+def norm_tract_names(col):
     """
-    Normalize tract NAME strings so '113.10' -> '113.1' and strip whitespace.
+    Normalize a column of tract NAME strings so '113.10' -> '113.1' and strip whitespace.
     Keeps names like '101.02' as-is.
     """
-    s = str(x).strip()
-    if re.fullmatch(r"\d+(\.\d+)?", s):
-        # Remove trailing zero(s) but keep necessary decimals
-        s = s.rstrip('0').rstrip('.') if '.' in s else s
-        if s == "":
-            s = "0"
-    return s
+    s = col.astype(str).str.strip()
+    # Remove trailing zero(s) but keep necessary decimals (only on purely numeric names)
+    trimmed = s.str.replace(r"0+$", "", regex=True).str.rstrip(".")
+    return s.where(~s.str.fullmatch(_DECIMAL_NAME), trimmed)
 
 def make_colormap(colors, values, caption):
     vmin = float(values.min()) if len(values) else 0.0
@@ -59,79 +69,110 @@ def make_colormap(colors, values, caption):
 # 1) Read & prep tracts
 # -------------------------------
 
-tracts = gpd.read_file("tl_2021_18_tract.shp")
+# Only the three counties leave the OGR driver (COUNTYFP is already a string field)
+county_fips = ["099", "141", "039"]
+filtered = read_cached(
+    "tl_2021_18_tract.shp",
+    where=fips_where(county_fips),
+)
 # TIGER usually ships as EPSG:4269; move to 4326 once for web maps
-if tracts.crs is None:
-    tracts = tracts.set_crs(4269)
-tracts = tracts.to_crs(4326)
+if filtered.crs is None:
+    filtered = filtered.set_crs(4269)
+filtered = slim_coverage(reproject(filtered, 4326))  # smaller GeoJSON in the HTML, shared edges kept
 
 # Normalize joining key to mirror R's NAME-based merges safely
-tracts["NAME"] = tracts["NAME"].astype(str).map(norm_tract_name)
-tracts["COUNTYFP"] = tracts["COUNTYFP"].astype(str)
-
-county_fips = ["099", "141", "039"]
-filtered = tracts[tracts["COUNTYFP"].isin(county_fips)].copy()
-
-# Per-county subsets like R (optional)
-c_elkhart  = filtered[filtered["COUNTYFP"] == "039"].copy()
-c_stjoseph = filtered[filtered["COUNTYFP"] == "141"].copy()
-c_marshall = filtered[filtered["COUNTYFP"] == "099"].copy()
+filtered["NAME"] = norm_tract_names(filtered["NAME"])
 
 # -------------------------------
 # 2) Read CSVs exactly like R (keep names)
 # -------------------------------
 
+# exact column names from your R code (age bins summed in add_age_metrics)
+U18_COLS = [
+    "Male..Under.5.years.x", "Male..5.to.9.years", "Male..10.to.14.years", "Male..15.to.17.years",
+    "Female..Under.5.years.x", "Female..5.to.9.years", "Female..10.to.14.years", "Female..15.to.17.years"
+]
+O65_COLS = [
+    "Male..65.and.66.years", "Male..67.to.69.years", "Male..70.to.74.years", "Male..75.to.79.years",
+    "Male..80.to.84.years", "Male..85.years.and.over",
+    "Female..65.and.66.years", "Female..67.to.69.years", "Female..70.to.74.years",
+    "Female..75.to.79.years", "Female..80.to.84.years", "Female..85.years.and.over"
+]
+
+# Which columns each table feeds downstream (the first column, NAME, is always kept)
+USECOLS = {
+    "age":     lambda c: c in {"Total", *U18_COLS, *O65_COLS},
+    "income":  lambda c: c == "Median.Income.",
+    "poverty": lambda c: re.search(r"poverty", c, re.I) is not None,
+    "sex":     lambda c: c in {"Male", "Female"},
+    "tracts":  lambda c: c == "CensusReporter_Link",
+}
+
+def read_csv_cols(path, kind):
+    """Multithreaded pyarrow read_csv of only the USECOLS[kind] columns the file actually has."""
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for i, c in enumerate(header) if i == 0 or USECOLS[kind](c)]
+    return pd.read_csv(path, engine="pyarrow", usecols=usecols)
+
 # Age
-df1 = pd.read_csv("Elkhart_Age_Data_Transposed.csv")
-df2 = pd.read_csv("St_Joseph_Age_Data_Transposed.csv")
-df3 = pd.read_csv("Marshall_Age_Data_Transposed.csv")
+df1 = read_csv_cols("Elkhart_Age_Data_Transposed.csv", "age")
+df2 = read_csv_cols("St_Joseph_Age_Data_Transposed.csv", "age")
+df3 = read_csv_cols("Marshall_Age_Data_Transposed.csv", "age")
 
 # Median income
-df_1 = pd.read_csv("Elkhart_MedianIncome_Transposed.csv")
-df_2 = pd.read_csv("St_Joseph_MedianIncome_Transposed.csv")
-df_3 = pd.read_csv("Marshall_MedianIncome_Tranposed.csv")  # (typo kept to match your file)
+df_1 = read_csv_cols("Elkhart_MedianIncome_Transposed.csv", "income")
+df_2 = read_csv_cols("St_Joseph_MedianIncome_Transposed.csv", "income")
+df_3 = read_csv_cols("Marshall_MedianIncome_Tranposed.csv", "income")  # (typo kept to match your file)
 
 # Poverty
-DF1 = pd.read_csv("Elkhart_PovPercent_Transposed.csv")
-DF2 = pd.read_csv("St_Joseph_PovPercent_Transposed.csv")
-DF3 = pd.read_csv("Marhsall_PovPercent_Transposed.csv")    # (typo kept to match your file)
+DF1 = read_csv_cols("Elkhart_PovPercent_Transposed.csv", "poverty")
+DF2 = read_csv_cols("St_Joseph_PovPercent_Transposed.csv", "poverty")
+DF3 = read_csv_cols("Marhsall_PovPercent_Transposed.csv", "poverty")    # (typo kept to match your file)
 
 # Sex (first col becomes NAME in R)
-DF_1 = pd.read_csv("elkhart_sex.csv")
-DF_2 = pd.read_csv("joseph_sex.csv")
-DF_3 = pd.read_csv("marshall_sex.csv")
+DF_1 = read_csv_cols("elkhart_sex.csv", "sex")
+DF_2 = read_csv_cols("joseph_sex.csv", "sex")
+DF_3 = read_csv_cols("marshall_sex.csv", "sex")
 for d in (DF_1, DF_2, DF_3):
     d.rename(columns={d.columns[0]: "NAME"}, inplace=True)
 
 # Tract metadata / links
-DataF1 = pd.read_csv("Elkhart_Tracts_Cleaned.csv")
-DataF2 = pd.read_csv("StJOE_Renamed_Tract_Column.csv")
-DataF3 = pd.read_csv("Marshall_Tracts_Cleaned.csv")
+DataF1 = read_csv_cols("Elkhart_Tracts_Cleaned.csv", "tracts")
+DataF2 = read_csv_cols("StJOE_Renamed_Tract_Column.csv", "tracts")
+DataF3 = read_csv_cols("Marshall_Tracts_Cleaned.csv", "tracts")
 
 # Force NAME to str + normalize like the shapefile
 for d in (df1, df2, df3, df_1, df_2, df_3, DF1, DF2, DF3, DF_1, DF_2, DF_3, DataF1, DataF2, DataF3):
     if "NAME" in d.columns:
-        d["NAME"] = d["NAME"].astype(str).map(norm_tract_name)
+        d["NAME"] = norm_tract_names(d["NAME"])
 
 # -------------------------------
-# 3) Merge per county (by NAME) like R
+# 3) Stack the per-county tables, then merge once against all tracts
 # -------------------------------
 
+def stack_counties(elkhart, stjoseph, marshall):
+    """One table per attribute, tagged with COUNTYFP (tract NAMEs like '1' repeat across counties)."""
+    return pd.concat(
+        [elkhart.assign(COUNTYFP="039"), stjoseph.assign(COUNTYFP="141"), marshall.assign(COUNTYFP="099")],
+        ignore_index=True
+    )
+
+df_inc  = stack_counties(df_1, df_2, df_3)
+df_age  = stack_counties(df1, df2, df3)
+DF_pov  = stack_counties(DF1, DF2, DF3)
+DataF   = stack_counties(DataF1, DataF2, DataF3)
+DF_sex  = stack_counties(DF_1, DF_2, DF_3)
+
 def merge_chain(sf_gdf, *dfs):
-    out = sf_gdf.copy()
+    out = sf_gdf
     for d in dfs:
         if "NAME" in d.columns:
-            out = out.merge(d, on="NAME", how="left")
+            out = out.merge(d, on=["COUNTYFP", "NAME"], how="left")
         else:
             raise ValueError("All attribute frames must include NAME for this merge path.")
     return out
 
-# Elkhart
-Counties_1 = merge_chain(c_elkhart,  df_1, df1, DF1, DataF1, DF_1)
-# St. Joseph
-Counties_2 = merge_chain(c_stjoseph, df_2, df2, DF2, DataF2, DF_2)
-# Marshall
-Counties_3 = merge_chain(c_marshall, df_3, df3, DF3, DataF3, DF_3)
+merged = merge_chain(filtered, df_inc, df_age, DF_pov, DataF, DF_sex)
 
 # -------------------------------
 # 4) Derived metrics (Under 18, Over 65, percents, poverty+income clean)
@@ -144,19 +185,8 @@ def safe_sum(df, cols):
     return df[use].apply(pd.to_numeric, errors="coerce").sum(axis=1)
 
 def add_age_metrics(df):
-    # exact column names from your R code
-    u18_cols = [
-        "Male..Under.5.years.x", "Male..5.to.9.years", "Male..10.to.14.years", "Male..15.to.17.years",
-        "Female..Under.5.years.x", "Female..5.to.9.years", "Female..10.to.14.years", "Female..15.to.17.years"
-    ]
-    o65_cols = [
-        "Male..65.and.66.years", "Male..67.to.69.years", "Male..70.to.74.years", "Male..75.to.79.years",
-        "Male..80.to.84.years", "Male..85.years.and.over",
-        "Female..65.and.66.years", "Female..67.to.69.years", "Female..70.to.74.years",
-        "Female..75.to.79.years", "Female..80.to.84.years", "Female..85.years.and.over"
-    ]
-    df["Under_18"] = safe_sum(df, u18_cols)
-    df["Over_65"]  = safe_sum(df, o65_cols)
+    df["Under_18"] = safe_sum(df, U18_COLS)
+    df["Over_65"]  = safe_sum(df, O65_COLS)
     total = pd.to_numeric(df.get("Total"), errors="coerce")
     df["Under_18Per"] = (df["Under_18"] / total) * 100
     df["Over_65Per"]  = (df["Over_65"]  / total) * 100
@@ -180,27 +210,20 @@ def add_income_poverty(df):
         df["POVERTY"] = pd.NA
 
     # numeric versions
-    df["MedianIncomeNum"] = df.get("Median.Income.", pd.Series([pd.NA]*len(df))).apply(parse_number)
-    df["PovertyNum"]      = df.get("POVERTY", pd.Series([pd.NA]*len(df))).apply(parse_number)
+    df["MedianIncomeNum"] = parse_numeric(df["Median.Income."]) if "Median.Income." in df.columns else np.nan
+    df["PovertyNum"]      = parse_numeric(df["POVERTY"])
     return df
 
-for g in (Counties_1, Counties_2, Counties_3):
-    add_age_metrics(g)
-    add_income_poverty(g)
+add_age_metrics(merged)
+add_income_poverty(merged)
 
 # Select columns (keep geometry!)
 sel_cols = [
     "NAME", "Median.Income.", "Over_65Per", "Under_18Per", "POVERTY",
     "CensusReporter_Link", "MedianIncomeNum", "PovertyNum", "Total", "geometry"
 ]
-Selected_1 = Counties_1[[c for c in sel_cols if c in Counties_1.columns]].copy()
-Selected_2 = Counties_2[[c for c in sel_cols if c in Counties_2.columns]].copy()
-Selected_3 = Counties_3[[c for c in sel_cols if c in Counties_3.columns]].copy()
-
-merged_gdf = gpd.GeoDataFrame(
-    pd.concat([Selected_1, Selected_2, Selected_3], ignore_index=True),
-    geometry="geometry", crs=Counties_1.crs
-)
+# selecting the geometry column keeps it a GeoDataFrame (dtype + crs); no re-wrap needed
+merged_gdf = merged[[c for c in sel_cols if c in merged.columns]].copy()
 
 # Convert poverty to percent if it came in as fraction (0–1)
 pn = pd.to_numeric(merged_gdf["PovertyNum"], errors="coerce")
@@ -208,9 +231,9 @@ merged_gdf["PovertyPct"] = np.where(pn <= 1.5, pn * 100, pn)
 
 # Labels for hover
 merged_gdf["Population"]     = pd.to_numeric(merged_gdf.get("Total"), errors="coerce")
-merged_gdf["PovertyLabel"]   = merged_gdf["PovertyPct"].map(lambda v: f"{v:.1f}%" if pd.notna(v) else "NA")
-merged_gdf["IncomeLabel"]    = merged_gdf["MedianIncomeNum"].map(lambda v: f"${v:,.0f}" if pd.notna(v) else "NA")
-merged_gdf["PopulationLabel"]= merged_gdf["Population"].map(lambda v: f"{int(v):,}" if pd.notna(v) else "NA")
+merged_gdf["PovertyLabel"]   = fmt_label(merged_gdf["PovertyPct"], "{:.1f}%")
+merged_gdf["IncomeLabel"]    = fmt_label(merged_gdf["MedianIncomeNum"], "${:,.0f}")
+merged_gdf["PopulationLabel"]= fmt_label(merged_gdf["Population"], "{:,.0f}")
 
 # -------------------------------
 # 5) Pantries (geocode if needed) + buffers (1 mile)
@@ -222,17 +245,11 @@ pantries = pd.read_csv("UPDATE5_Final_Cleaned_Pantry_Locations.csv - Sheet1.csv"
 if "lat" not in pantries.columns or "long" not in pantries.columns:
     geolocator = ArcGIS(timeout=10)
     geocode = RateLimiter(geolocator.geocode, min_delay_seconds=0.2)
-    lat, lon = [], []
-    for addr in pantries["Address"].astype(str).tolist():
-        loc = geocode(addr)
-        if loc:
-            lat.append(loc.latitude)
-            lon.append(loc.longitude)
-        else:
-            lat.append(np.nan)
-            lon.append(np.nan)
-    pantries["lat"]  = lat
-    pantries["long"] = lon
+    # I/O-bound: overlap request latency across threads (RateLimiter still spaces the request starts)
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        locs = list(ex.map(geocode, pantries["Address"].astype(str).tolist()))
+    pantries["lat"]  = [loc.latitude if loc else np.nan for loc in locs]
+    pantries["long"] = [loc.longitude if loc else np.nan for loc in locs]
 
 pantries = pantries.dropna(subset=["lat", "long"]).copy()
 pantries_gdf = gpd.GeoDataFrame(
@@ -240,15 +257,17 @@ pantries_gdf = gpd.GeoDataFrame(
 )
 
 # Buffer in a projected CRS: UTM 16N (EPSG:26916) then back to 4326
-pantries_buf = pantries_gdf.to_crs(26916).buffer(1609.34)  # 1 mile in meters
-pantries_buf = gpd.GeoSeries(pantries_buf, crs=26916).to_crs(4326)
-pantries_buf_gdf = gpd.GeoDataFrame(geometry=pantries_buf, crs=4326)
+# (plain geometry arrays end to end; no intermediate GeoSeries/GeoDataFrame)
+pts_proj  = shapely.transform(pantries_gdf.geometry.values, transformer(4326, 26916).transform, interleaved=False)
+bufs_proj = shapely.buffer(pts_proj, 1609.34, quad_segs=8)  # 1 mile in meters
+bufs_wgs  = shapely.transform(bufs_proj, transformer(26916, 4326).transform, interleaved=False)
+pantries_buf_gdf = slim(gpd.GeoDataFrame(geometry=bufs_wgs, crs=4326))
 
 # -------------------------------
 # 6) Bus routes & counties
 # -------------------------------
 
-routes = gpd.read_file("TranspoRoutes.shp").to_crs(4326)
+routes = slim(reproject(read_cached("TranspoRoutes.shp"), 4326))
 line_attr = "line_name" if "line_name" in routes.columns else ("clean_name" if "clean_name" in routes.columns else None)
 if not line_attr:
     raise ValueError("TranspoRoutes.shp must include a 'line_name' or 'clean_name' column.")
@@ -278,8 +297,10 @@ route_colors = {
     "9 Northside Mishawaka": "magenta"
 }
 
-counties = gpd.read_file("County_Boundaries_of_Indiana_Current.shp").to_crs(4326)
-target_counties = counties[counties["name"].isin(["Elkhart", "Marshall", "St Joseph"])].copy()
+target_counties = slim_coverage(reproject(read_cached(
+    "County_Boundaries_of_Indiana_Current.shp",
+    where="name IN ('Elkhart', 'Marshall', 'St Joseph')",
+), 4326))
 
 # -------------------------------
 # 7) Map: poverty overlay + counties + routes + pantry buffers + markers
@@ -296,10 +317,10 @@ pov_cmap = make_colormap(
 
 poverty_fg = FeatureGroup(name="Poverty Level", show=True)
 
+merged_gdf["__fill__"] = cmap_hex(pov_cmap, merged_gdf["PovertyPct"], "#bdbdbd")
+
 def style_poverty(feat):
-    v = feat["properties"].get("PovertyPct", None)
-    color = "#bdbdbd" if v is None else pov_cmap(v)
-    return {"fillColor": color, "color": "white", "weight": 0.3, "fillOpacity": 0.55}
+    return {"fillColor": feat["properties"]["__fill__"], "color": "white", "weight": 0.3, "fillOpacity": 0.55}
 
 tooltip_pov = folium.GeoJsonTooltip(
     fields=["NAME", "PovertyLabel", "PopulationLabel"],
@@ -314,7 +335,7 @@ popup_pov = folium.GeoJsonPopup(
 )
 
 folium.GeoJson(
-    data=merged_gdf.to_json(),
+    data=gj(merged_gdf),
     style_function=style_poverty,
     tooltip=tooltip_pov,
     popup=popup_pov,
@@ -327,7 +348,7 @@ pov_cmap.add_to(m)
 
 # County boundaries (always on; not toggled)
 folium.GeoJson(
-    target_counties.to_json(),
+    gj(target_counties),
     name="County Boundaries",
     style_function=lambda f: {"color": "black", "weight": 3, "opacity": 0.8},
     tooltip=folium.GeoJsonTooltip(fields=["name"], aliases=["County"], localize=True, sticky=True)
@@ -342,7 +363,7 @@ def route_style(feat):
     return {"color": col, "weight": 3, "opacity": 0.9}
 
 folium.GeoJson(
-    routes.to_json(),
+    gj(routes),
     name="Bus Routes",
     style_function=route_style,
     tooltip=folium.GeoJsonTooltip(fields=[line_attr], aliases=["Route"])
@@ -352,7 +373,7 @@ routes_fg.add_to(m)
 # Pantry coverage buffers (overlay, initially hidden)
 buffers_fg = FeatureGroup(name="Pantry Coverage", show=False)
 folium.GeoJson(
-    pantries_buf_gdf.to_json(),
+    gj(pantries_buf_gdf),
     name="Pantry Coverage",
     style_function=lambda f: {"fillColor": "#6A5ACD", "color": "#6A5ACD", "weight": 1, "fillOpacity": 0.1}
 ).add_to(buffers_fg)
@@ -360,24 +381,23 @@ buffers_fg.add_to(m)
 
 # Pantry markers (overlay, initially hidden) with clustering
 markers_fg = FeatureGroup(name="Food Pantries", show=False)
-mc = MarkerCluster().add_to(markers_fg)
-for _, r in pantries.iterrows():
-    lat, lon = r["lat"], r["long"]
-    if pd.isna(lat) or pd.isna(lon):
-        continue
-    name = r.get("Pantry.Name", "Pantry")
-    addr = r.get("Address", "N/A")
-    hours = r.get("Recurring.Hours", "N/A")
-    reqs  = r.get("What.to.Bring", "N/A")
-    link  = r.get("Link", "")
-    html = f"""
-    <b>{name}</b><br>
-    Address: {addr}<br>
-    Hours: {hours}<br>
-    Requirements: {reqs}<br>
-    <a href="{link}" target="_blank">View on Google Maps</a>
-    """
-    folium.Marker([lat, lon], popup=folium.Popup(html, max_width=350)).add_to(mc)
+# one JSON array + a JS callback instead of a folium Marker/Popup object per pantry
+popup_html = (
+    "<b>" + text_col(pantries, "Pantry.Name", "Pantry") + "</b><br>"
+    + "Address: " + text_col(pantries, "Address", "N/A") + "<br>"
+    + "Hours: " + text_col(pantries, "Recurring.Hours", "N/A") + "<br>"
+    + "Requirements: " + text_col(pantries, "What.to.Bring", "N/A") + "<br>"
+    + '<a href="' + text_col(pantries, "Link", "") + '" target="_blank">View on Google Maps</a>'
+)
+marker_rows = [[la, lo, h] for la, lo, h in zip(pantries["lat"].tolist(), pantries["long"].tolist(), popup_html.tolist())]
+marker_callback = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(row[2], {maxWidth: 350});
+    return marker;
+}
+"""
+FastMarkerCluster(marker_rows, callback=marker_callback).add_to(markers_fg)
 markers_fg.add_to(m)
 
 # Layers control (like your R addLayersControl + hideGroup defaults via show=False above)
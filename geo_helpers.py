@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Shared read / reproject / serialize helpers for the PythonCode*.py map scripts.
+"""
+
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.io.json import ujson_dumps
+import geopandas as gpd
+import shapely
+from pyproj import Transformer
+from pyogrio import read_dataframe
+
+
+def fips_where(codes):
+    """OGR SQL WHERE keeping the given COUNTYFP codes (a string field in the TIGER tracts)."""
+    return "COUNTYFP IN ({})".format(",".join(f"'{c}'" for c in codes))
+
+def read_cached(path, **kwargs):
+    """read_dataframe(path, **kwargs) with a GeoParquet copy next to the source for warm runs.
+
+    The cache name includes a hash of kwargs (where/columns), and a newer source invalidates it.
+    """
+    path = Path(path)
+    key = hashlib.md5(repr(sorted(kwargs.items())).encode()).hexdigest()[:8]
+    cache = path.with_name(f"{path.stem}.{key}.parquet")
+    if cache.exists() and cache.stat().st_mtime >= path.stat().st_mtime:
+        return gpd.read_parquet(cache)
+    gdf = read_dataframe(path, use_arrow=True, **kwargs)
+    gdf.to_parquet(cache)
+    return gdf
+
+@lru_cache(maxsize=None)
+def transformer(src, dst):
+    """One pyproj Transformer per (src, dst) pair; building the PROJ pipeline is the expensive part."""
+    return Transformer.from_crs(src, dst, always_xy=True)
+
+def reproject(gdf, dst):
+    """Drop-in for gdf.to_crs(dst) that reuses the cached Transformer (vectorized over all vertices)."""
+    src = gdf.crs.to_epsg() or gdf.crs.to_wkt()
+    if src == dst:
+        return gdf  # already there: skip the pipeline build and the identity pass over every vertex
+    geoms = shapely.transform(gdf.geometry.values, transformer(src, dst).transform, interleaved=False)
+    return gdf.set_geometry(geoms, crs=dst)
+
+def slim(gdf, tol=1e-4, grid=1e-5):
+    """Snap coords to a ~1 m grid and drop sub-~10 m vertices so the HTML carries 5 decimals, not 15."""
+    geoms = shapely.set_precision(gdf.geometry.values, grid)
+    return gdf.set_geometry(shapely.simplify(geoms, tol, preserve_topology=True), crs=gdf.crs)
+
+def slim_coverage(gdf, tol=1e-4, grid=1e-5):
+    """slim() for polygons that tile (tracts, counties): simplify shared edges once so no slivers or overlaps.
+
+    Needs GEOS >= 3.12; input that is not a valid coverage gets the per-feature slim() instead.
+    """
+    geoms = gdf.geometry.values
+    if not shapely.coverage_is_valid(geoms):
+        return slim(gdf, tol, grid)
+    geoms = shapely.set_precision(shapely.coverage_simplify(geoms, tol), grid)
+    return gdf.set_geometry(geoms, crs=gdf.crs)
+
+def gj(gdf):
+    """GeoJSON string via pandas' C ujson encoder (folium.GeoJson accepts a str directly).
+
+    No per-feature bbox (__geo_interface__ adds one), same feature layout as to_json().
+    """
+    return ujson_dumps(gdf.to_geo_dict(show_bbox=False))
+
+def cmap_hex(cmap, values, na_color):
+    """Vectorized cmap(v) for a branca LinearColormap: interpolate each RGB channel over its stops.
+
+    Returns '#rrggbb' (branca's '#rrggbbff' without the alpha byte).
+    """
+    v = np.asarray(pd.to_numeric(values, errors="coerce"), dtype=float)
+    stops = np.asarray(cmap.colors)  # (k, 4) RGBA floats in [0, 1]
+    if cmap.index[0] == cmap.index[-1]:
+        # vmin == vmax: np.interp would pick the last stop, branca returns the first
+        rgb = np.tile(stops[0, :3], (len(v), 1))
+    else:
+        rgb = np.column_stack([np.interp(v, cmap.index, stops[:, i]) for i in range(3)])
+    rgb = (np.nan_to_num(rgb) * 255.9999).astype(int)  # same float->byte rounding as branca
+    hexes = np.array([f"#{r:02x}{g:02x}{b:02x}" for r, g, b in rgb], dtype=object)
+    return np.where(np.isnan(v), na_color, hexes)
@@ -1,5 +1,12 @@
 import pandas as pd
 import requests
+from concurrent.futures import ThreadPoolExecutor
+
+try:  # optional: repeated runs are served from a local sqlite cache
+    import requests_cache
+    requests_cache.install_cache("census")
+except ImportError:
+    pass
 
 pd.set_option("display.max_rows", None)
 pd.set_option("display.max_columns", None)
@@ -8,20 +15,24 @@ YEAR = "2023"
 STATE = "18"
 COUNTIES = ["039","099","141"]
 
+SESSION = requests.Session()  # keep-alive: one TLS handshake shared by all requests
+
+def _fetch_county(c, vars, dataset):
+    url = f"https://api.census.gov/data/{YEAR}/{dataset}"
+    params = {
+        "get": ",".join(["NAME"] + vars),
+        "for": "tract:*",
+        "in": f"state:{STATE}+county:{c}"
+    }
+    r = SESSION.get(url, params=params); r.raise_for_status()
+    cols, *rows = r.json()
+    return pd.DataFrame(rows, columns=cols)
+
 def fetch_acs(vars, dataset="acs/acs5"):
-    frames = []
-    for c in COUNTIES:
-        url = f"https://api.census.gov/data/{YEAR}/{dataset}"
-        params = {
-            "get": ",".join(["NAME"] + vars),
-            "for": "tract:*",
-            "in": f"state:{STATE}+county:{c}"
-        }
-        r = requests.get(url, params=params); r.raise_for_status()
-        cols, *rows = r.json()
-        df = pd.DataFrame(rows, columns=cols)
-        frames.append(df)
-    return pd.concat(frames, ignore_index=True)
+    # counties are independent requests; fetch them concurrently
+    with ThreadPoolExecutor(max_workers=len(COUNTIES)) as ex:
+        frames = ex.map(lambda c: _fetch_county(c, vars, dataset), COUNTIES)
+        return pd.concat(frames, ignore_index=True)
 
 # Median income
 inc = fetch_acs(["B19013_001E"])